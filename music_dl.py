@@ -2,6 +2,11 @@
 """Download music from Suno or other music platforms."""
 
 import argparse
+import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.util
 import json
 import os
 import re
@@ -9,11 +14,15 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import unquote
 
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util import Retry, make_headers
 
 UA = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -26,9 +35,31 @@ SESSION.headers.update(
         "User-Agent": UA,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
+        # Only advertise encodings urllib3 can actually decode here
+        # (br/zstd depend on optional packages).
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+        "Connection": "keep-alive",
     }
 )
 
+# Segment downloads run concurrently; size the pool so workers don't block
+# waiting for a free connection.
+SEGMENT_WORKERS = 16
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = (429, 502, 503, 504)
+_ADAPTER = HTTPAdapter(
+    pool_connections=SEGMENT_WORKERS,
+    pool_maxsize=2 * SEGMENT_WORKERS,
+    max_retries=Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+    ),
+)
+SESSION.mount("http://", _ADAPTER)
+SESSION.mount("https://", _ADAPTER)
+
 
 def detect_platform(url: str) -> str:
     """Return the platform name based on the URL."""
@@ -42,47 +73,83 @@ def detect_platform(url: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-def fetch_page(url: str) -> str:
+# Page scanning runs on the raw response bytes; only the captured pieces
+# are decoded to str.
+_NEXT_F_RE = re.compile(
+    rb'self\.__next_f\.push\(\s*\[.*?,\s*"((?:[^"\\]|\\.)*)"\s*\]\s*\)'
+)
+_ESC_RE = re.compile(rb'\\(["\\/nt])')
+_ESC = {b'"': b'"', b"\\": b"\\", b"/": b"/", b"n": b"\n", b"t": b"\t"}
+_SONG_PATH_RE = re.compile(r'"song_path"\s*:\s*"([^"]+)"')
+_JSON_DECODER = json.JSONDecoder()
+_KEY_RES = {
+    k: re.compile(rf'"{k}"\s*:\s*"([^"]*)"') for k in ("id", "title", "artist")
+}
+
+
+def fetch_page(url: str) -> bytes:
     resp = SESSION.get(url)
     resp.raise_for_status()
-    return resp.text
+    return resp.content
 
 
-def extract_song_info(html: str) -> dict:
+def extract_song_info(html: bytes) -> dict:
     """Extract song metadata from the Next.js page HTML."""
     # Gather all __next_f payloads
-    payload = ""
-    for m in re.finditer(
-        r'self\.__next_f\.push\(\s*\[.*?,\s*"((?:[^"\\]|\\.)*)"\s*\]\s*\)', html
-    ):
-        raw = m.group(1)
-        raw = raw.replace('\\"', '"').replace("\\\\", "\\")
-        raw = raw.replace("\\/", "/").replace("\\n", "\n").replace("\\t", "\t")
-        payload += raw
-
-    info = _find_song_in_text(payload) or _find_song_in_text(html)
+    parts = []
+    for m in _NEXT_F_RE.finditer(html):
+        raw = _ESC_RE.sub(lambda e: _ESC[e.group(1)], m.group(1))
+        parts.append(raw)
+    payload = b"".join(parts).decode("utf-8", "replace")
+
+    info = _find_song_in_text(payload) or _find_song_in_text(
+        html.decode("utf-8", "replace")
+    )
     if not info:
         raise RuntimeError("Could not find song metadata in page")
     return info
 
 
+def _enclosing_object(text: str, m: re.Match) -> dict | None:
+    """Decode the JSON object that directly contains the song_path match."""
+    floor = max(0, m.start() - 2000)
+    lo = m.start()
+    while (lo := text.rfind("{", floor, lo)) != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, lo)
+        except ValueError:
+            continue
+        if end >= m.end() and isinstance(obj, dict) and "song_path" in obj:
+            return obj
+    return None
+
+
 def _find_song_in_text(text: str) -> dict | None:
-    m = re.search(r'"song_path"\s*:\s*"([^"]+)"', text)
+    m = _SONG_PATH_RE.search(text)
     if not m:
         return None
-    song_path = unquote(unquote(m.group(1)))
-
-    pos = m.start()
-    ctx = text[max(0, pos - 2000) : pos + 500]
-
-    def _json_str(key: str) -> str:
-        m2 = re.search(rf'"{key}"\s*:\s*"([^"]*)"', ctx)
-        return m2.group(1) if m2 else "Unknown"
+    raw_path = m.group(1)
+    song_path = unquote(raw_path)
+    # Only decode again when the path was double-encoded ("%25xx"), so a
+    # literal "%" in a single-encoded path survives.
+    if "%25" in raw_path and "%" in song_path:
+        song_path = unquote(song_path)
+
+    # Prefer the object's own keys; anything it lacks (e.g. an artist held
+    # by a parent object) comes from the surrounding window as before.
+    obj = _enclosing_object(text, m) or {}
+    fields = {k: v for k in _KEY_RES if isinstance(v := obj.get(k), str)}
+    if len(fields) < len(_KEY_RES):
+        pos = m.start()
+        ctx = text[max(0, pos - 2000) : pos + 500]
+        for k, r in _KEY_RES.items():
+            if k not in fields and (m2 := r.search(ctx)):
+                fields[k] = m2.group(1)
 
     return {
-        "id": _json_str("id"),
-        "title": _json_str("title"),
-        "artist": _json_str("artist"),
+        "id": fields.get("id", "Unknown"),
+        "title": fields.get("title", "Unknown"),
+        "artist": fields.get("artist", "Unknown"),
         "song_path": song_path,
     }
 
@@ -92,25 +159,32 @@ def _find_song_in_text(text: str) -> dict | None:
 # ---------------------------------------------------------------------------
 
 
-def extract_suno_info(html: str, url: str) -> dict:
+_OG_TITLE_RE = re.compile(rb'property="og:title"\s+content="([^"]*)"')
+_OG_AUDIO_RE = re.compile(rb'property="og:audio"\s+content="([^"]*)"')
+_DESCRIPTION_RE = re.compile(rb'name="description"\s+content="([^"]*)"')
+_BY_ARTIST_RE = re.compile(r" by (.+?)(?:\s*\(@.+?\))?\.?\s*(?:Listen|$)")
+_SUNO_SONG_ID_RE = re.compile(r"/song/([a-f0-9-]+)")
+
+
+def extract_suno_info(html: bytes, url: str) -> dict:
     """Extract song metadata from Suno page OG tags."""
-    m = re.search(r'property="og:title"\s+content="([^"]*)"', html)
-    title = m.group(1) if m else "Unknown"
+    m = _OG_TITLE_RE.search(html)
+    title = m.group(1).decode("utf-8", "replace") if m else "Unknown"
 
-    m = re.search(r'property="og:audio"\s+content="([^"]*)"', html)
-    audio_url = m.group(1) if m else None
+    m = _OG_AUDIO_RE.search(html)
+    audio_url = m.group(1).decode("utf-8", "replace") if m else None
 
     # description format: "Title by Artist (@handle). ..."
     artist = "Unknown"
-    m = re.search(r'name="description"\s+content="([^"]*)"', html)
+    m = _DESCRIPTION_RE.search(html)
     if m:
-        desc = m.group(1)
-        m2 = re.search(r" by (.+?)(?:\s*\(@.+?\))?\.?\s*(?:Listen|$)", desc)
+        desc = m.group(1).decode("utf-8", "replace")
+        m2 = _BY_ARTIST_RE.search(desc)
         if m2:
             artist = m2.group(1).strip()
 
     # Extract song ID from URL
-    m = re.search(r"/song/([a-f0-9-]+)", url)
+    m = _SUNO_SONG_ID_RE.search(url)
     song_id = m.group(1) if m else "Unknown"
 
     if not audio_url:
@@ -124,9 +198,13 @@ def extract_suno_info(html: str, url: str) -> dict:
     }
 
 
+_FN_TABLE = str.maketrans(
+    {c: "_" for c in '<>:"/\\|?*' + "".join(chr(i) for i in range(32))}
+)
+
+
 def safe_filename(artist: str, title: str, ext: str) -> str:
-    name = f"{artist} - {title}.{ext}"
-    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name)
+    return f"{artist} - {title}.{ext}".translate(_FN_TABLE)
 
 
 # ---------------------------------------------------------------------------
@@ -134,8 +212,29 @@ def safe_filename(artist: str, title: str, ext: str) -> str:
 # ---------------------------------------------------------------------------
 
 
+class _ProgressReader:
+    """File-like wrapper that advances a progress bar as it is read."""
+
+    def __init__(self, raw, pbar: tqdm):
+        self._raw = raw
+        self._pbar = pbar
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        # tell() counts bytes off the wire, matching Content-Length even
+        # when the body is content-encoded.
+        self._pbar.update(self._raw.tell() - self._pbar.n)
+        return data
+
+
 def try_download_mp3(song_path: str, dest: Path) -> bool:
     """Try the direct MP3 link. Returns True if successful."""
+    # Cheap body-less probe: DRM-only songs are rejected here without
+    # opening a streaming download.
+    probe = SESSION.head(song_path, allow_redirects=True, timeout=10)
+    if probe.status_code in (403, 404):
+        return False
+
     resp = SESSION.get(song_path, stream=True)
     if resp.status_code in (403, 404):
         return False
@@ -143,14 +242,16 @@ def try_download_mp3(song_path: str, dest: Path) -> bool:
 
     total = int(resp.headers.get("Content-Length", 0)) or None
     part = dest.with_suffix(".mp3.part")
+
+    # Copy the body in 1 MiB blocks straight from the urllib3 response,
+    # skipping requests' iter_content chunking.
+    resp.raw.decode_content = True
     with open(part, "wb") as f, tqdm(
         total=total, unit="B", unit_scale=True, desc="Downloading MP3"
     ) as pbar:
-        for chunk in resp.iter_content(chunk_size=64 * 1024):
-            f.write(chunk)
-            pbar.update(len(chunk))
+        shutil.copyfileobj(_ProgressReader(resp.raw, pbar), f, length=1024 * 1024)
 
-    part.rename(dest)
+    os.replace(part, dest)
     return True
 
 
@@ -159,31 +260,59 @@ def try_download_mp3(song_path: str, dest: Path) -> bool:
 # ---------------------------------------------------------------------------
 
 
+_KEYID_PREFIX = "KEYID=0x"
+_PSSH_PREFIX = 'URI="data:text/plain;base64,'
+_MAP_URI_PREFIX = 'EXT-X-MAP:URI="'
+
+
+def _attr_value(line: str, prefix: str, stop: str) -> str | None:
+    """Return the value following ``prefix`` in a tag line, ending at
+    ``stop`` or the end of the line."""
+    i = line.find(prefix)
+    if i == -1:
+        return None
+    i += len(prefix)
+    j = line.find(stop, i)
+    return line[i:j] if j != -1 else line[i:]
+
+
 def fetch_stream_segments(song_id: str) -> dict:
     url = f"https://stream.udio.com/api/v2/audio-stream/content/{song_id}/manifest.m3u8"
     resp = SESSION.get(url, headers={"Origin": "https://www.udio.com"})
     resp.raise_for_status()
     manifest = resp.text
 
-    m = re.search(r"KEYID=0x([0-9a-fA-F]+)", manifest)
-    key_id = m.group(1).lower() if m else song_id.replace("-", "")
-
-    m = re.search(r'URI="data:text/plain;base64,([A-Za-z0-9+/=]+)"', manifest)
-    pssh_b64 = m.group(1) if m else None
-
-    m = re.search(r'EXT-X-MAP:URI="([^"]+)"', manifest)
-    init_uri = m.group(1) if m else f"/api/v2/audio-stream/content/{song_id}/init.mp4"
-
+    # Single pass over the manifest: tags are dispatched on their prefix and
+    # the first KEYID / PSSH / MAP seen wins.
+    key_id = pssh_b64 = init_uri = None
     segment_uris = []
+    duration = 0.0
     after_extinf = False
     for line in manifest.splitlines():
         line = line.strip()
         if line.startswith("#EXTINF:"):
             after_extinf = True
-        elif after_extinf and line and not line.startswith("#"):
+            try:
+                duration += float(line[len("#EXTINF:") :].split(",", 1)[0])
+            except ValueError:
+                pass
+        elif line.startswith("#EXT-X-MAP:"):
+            if init_uri is None:
+                init_uri = _attr_value(line, _MAP_URI_PREFIX, '"')
+        elif line.startswith("#"):
+            if key_id is None and (v := _attr_value(line, _KEYID_PREFIX, ",")):
+                key_id = v.lower()
+            if pssh_b64 is None:
+                pssh_b64 = _attr_value(line, _PSSH_PREFIX, '"')
+        elif after_extinf and line:
             segment_uris.append(line)
             after_extinf = False
 
+    if key_id is None:
+        key_id = song_id.replace("-", "")
+    if init_uri is None:
+        init_uri = f"/api/v2/audio-stream/content/{song_id}/init.mp4"
+
     if not segment_uris:
         raise RuntimeError("No media segments found in HLS manifest")
 
@@ -192,6 +321,8 @@ def fetch_stream_segments(song_id: str) -> dict:
         "pssh_b64": pssh_b64,
         "init_uri": init_uri,
         "segment_uris": segment_uris,
+        "manifest_url": url,
+        "duration": duration,
     }
 
 
@@ -238,40 +369,112 @@ def find_wvd_device() -> Path | None:
     return None
 
 
+_HEX_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def _key_cache_path() -> Path:
+    return _config_dir() / "keys.json"
+
+
+def _load_key_cache() -> dict:
+    try:
+        with open(_key_cache_path()) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_key_cache(cache: dict) -> None:
+    """Atomically replace the cache file; it holds content keys, so it is
+    created owner-only (mkstemp uses mode 0600)."""
+    path = _key_cache_path()
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".keys.", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        if tmp:
+            Path(tmp).unlink(missing_ok=True)
+        print(f"Could not write key cache {path}: {e}", file=sys.stderr)
+
+
 def obtain_content_key(cdm_path: Path, pssh_b64: str, key_id: str) -> str:
+    """Get the content decryption key, from the on-disk cache if possible."""
+    cache_key = hashlib.sha1((key_id + pssh_b64).encode()).hexdigest()
+    cache = _load_key_cache()
+    cached = cache.get(cache_key)
+    if isinstance(cached, str) and _HEX_KEY_RE.fullmatch(cached):
+        return cached
+
+    key_hex = _request_content_key(cdm_path, pssh_b64, key_id)
+    cache[cache_key] = key_hex
+    _save_key_cache(cache)
+    return key_hex
+
+
+class _CdmPool:
+    """Keeps one Cdm per device file and leases sessions from it, so
+    repeated key lookups skip re-parsing and re-deriving the device."""
+
+    def __init__(self):
+        self._cdms = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cdm_path: Path):
+        from pywidevine.cdm import Cdm
+        from pywidevine.device import Device
+
+        with self._lock:
+            cdm = self._cdms.get(cdm_path)
+            if cdm is None:
+                device = Device.load(cdm_path)
+                cdm = self._cdms[cdm_path] = Cdm.from_device(device)
+            return cdm
+
+    @contextlib.contextmanager
+    def session(self, cdm_path: Path):
+        cdm = self._get(cdm_path)
+        session_id = cdm.open()
+        try:
+            yield cdm, session_id
+        finally:
+            cdm.close(session_id)
+
+
+_CDM_POOL = _CdmPool()
+
+
+def _request_content_key(cdm_path: Path, pssh_b64: str, key_id: str) -> str:
     """Get the content decryption key using pywidevine."""
-    from pywidevine.cdm import Cdm
-    from pywidevine.device import Device
     from pywidevine.pssh import PSSH
 
-    device = Device.load(cdm_path)
-    cdm = Cdm.from_device(device)
-    session_id = cdm.open()
-
-    pssh = PSSH(pssh_b64)
-    challenge = cdm.get_license_challenge(session_id, pssh)
+    with _CDM_POOL.session(cdm_path) as (cdm, session_id):
+        pssh = PSSH(pssh_b64)
+        challenge = cdm.get_license_challenge(session_id, pssh)
 
-    resp = SESSION.post(
-        LICENSE_URL,
-        data=challenge,
-        headers={"Origin": "https://www.udio.com"},
-    )
-    resp.raise_for_status()
+        resp = SESSION.post(
+            LICENSE_URL,
+            data=challenge,
+            headers={"Origin": "https://www.udio.com"},
+        )
+        resp.raise_for_status()
 
-    cdm.parse_license(session_id, resp.content)
+        cdm.parse_license(session_id, resp.content)
 
-    content_key = None
-    for key in cdm.get_keys(session_id):
-        if str(key.type) == "CONTENT":
-            kid_hex = key.kid.hex
-            key_hex = key.key.hex()
-            if kid_hex == key_id:
-                cdm.close(session_id)
-                return key_hex
-            if content_key is None:
-                content_key = key_hex
+        content_key = None
+        for key in cdm.get_keys(session_id):
+            if str(key.type) == "CONTENT":
+                kid_hex = key.kid.hex
+                key_hex = key.key.hex()
+                if kid_hex == key_id:
+                    return key_hex
+                if content_key is None:
+                    content_key = key_hex
 
-    cdm.close(session_id)
     if content_key:
         return content_key
     raise RuntimeError("No content key found in license response")
@@ -282,54 +485,240 @@ def obtain_content_key(cdm_path: Path, pssh_b64: str, key_id: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-def download_drm_stream(song_id: str, key_hex: str, dest: Path) -> None:
-    key_hex = key_hex.strip().lower()
-    if len(key_hex) != 32 or not all(c in "0123456789abcdef" for c in key_hex):
-        raise ValueError("Decryption key must be exactly 32 hex characters")
+@functools.lru_cache(maxsize=1)
+def _ffmpeg_hls_can_decrypt() -> bool:
+    """Whether ffmpeg's HLS demuxer can pass options to its segment demuxer.
 
-    print("Fetching HLS manifest...", file=sys.stderr)
-    segs = fetch_stream_segments(song_id)
-    print(f"  Key ID:   {segs['key_id']}", file=sys.stderr)
-    print(f"  Segments: {len(segs['segment_uris'])} + init", file=sys.stderr)
-
-    # Download encrypted segments into a temp file
-    with tempfile.NamedTemporaryFile(suffix=".enc.m4a", delete=False) as tmp_enc:
-        enc_path = Path(tmp_enc.name)
-
-        # Init segment
-        init_url = resolve_stream_uri(segs["init_uri"])
-        init_data = SESSION.get(
-            init_url, headers={"Origin": "https://www.udio.com"}
-        ).content
-        tmp_enc.write(init_data)
+    The content key is an option of the mp4 demuxer, so it can only reach
+    HLS segments through ``-seg_format_options`` (absent in older builds).
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-h", "demuxer=hls"],
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return False
+    return "seg_format_options" in result.stdout
 
-        # Media segments
-        for seg_name in tqdm(segs["segment_uris"], desc="Downloading segments"):
-            seg_url = resolve_stream_uri(seg_name)
-            resp = SESSION.get(seg_url, headers={"Origin": "https://www.udio.com"})
-            resp.raise_for_status()
-            tmp_enc.write(resp.content)
 
+def _probe_duration(path: Path) -> float | None:
     try:
-        # Decrypt with ffmpeg
-        print("Decrypting with ffmpeg...", file=sys.stderr)
         result = subprocess.run(
             [
-                "ffmpeg",
-                "-y",
-                "-loglevel", "error",
-                "-decryption_key", key_hex,
-                "-i", str(enc_path),
-                "-c", "copy",
-                str(dest),
+                "ffprobe",
+                "-v", "error",
+                "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1",
+                str(path),
             ],
             capture_output=True,
             text=True,
         )
-        if result.returncode != 0:
-            raise RuntimeError(f"ffmpeg decryption failed: {result.stderr}")
-    finally:
-        enc_path.unlink(missing_ok=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _decrypt_hls_with_ffmpeg(segs: dict, key_hex: str, dest: Path) -> bool:
+    """Let ffmpeg fetch and decrypt the stream itself from the manifest.
+
+    Experimental (``--ffmpeg-hls``); only call this when
+    ``_ffmpeg_hls_can_decrypt()`` is true. ffmpeg is given the manifest URL
+    rather than a local copy so ``-headers``/``-user_agent`` are carried
+    over to the segment requests. Returns False if the download fails or the
+    result can't be verified, in which case the caller should download
+    segments itself.
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            # HLS reports skipped segments only as warnings
+            "-loglevel", "warning",
+            "-user_agent", UA,
+            "-headers", "Origin: https://www.udio.com\r\n",
+            "-protocol_whitelist", "http,https,tcp,tls,crypto,data",
+            "-http_persistent", "1",
+            "-http_multiple", "1",
+            "-seg_format_options", f"decryption_key={key_hex}",
+            "-i", segs["manifest_url"],
+            "-c", "copy",
+            str(dest),
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    problem = None
+    if result.returncode != 0:
+        problem = result.stderr.strip()
+    elif "Failed to open segment" in result.stderr:
+        problem = "ffmpeg skipped one or more segments"
+    else:
+        # A skipped segment can still exit 0, so check nothing is missing
+        actual = _probe_duration(dest)
+        expected = segs["duration"]
+        if actual is None:
+            problem = "could not verify output duration with ffprobe"
+        elif abs(actual - expected) > max(1.0, 0.01 * expected):
+            problem = f"output is {actual:.1f}s, manifest lists {expected:.1f}s"
+
+    if problem:
+        print(f"ffmpeg HLS download failed, falling back: {problem}", file=sys.stderr)
+        dest.unlink(missing_ok=True)
+        return False
+    return True
+
+
+# Segments are written to ffmpeg through a buffer this large so several
+# small segments coalesce into one write(); kept well below a typical
+# song's size so decryption still starts while downloads are running.
+PIPE_BUFFER_SIZE = 1 << 20
+
+
+def _fetch_segment(seg_url: str) -> bytes:
+    resp = SESSION.get(seg_url, headers={"Origin": "https://www.udio.com"})
+    resp.raise_for_status()
+    return resp.content
+
+
+async def _afetch(session, url: str) -> bytes:
+    """GET one segment, retrying like SESSION's adapter does."""
+    import aiohttp
+
+    for attempt in range(RETRY_TOTAL + 1):
+        last = attempt == RETRY_TOTAL
+        try:
+            async with session.get(url) as resp:
+                if last or resp.status not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    return await resp.read()
+        except aiohttp.ClientConnectionError:
+            if last:
+                raise
+        await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+
+
+async def _download_segments_async(urls: list[str], write) -> None:
+    """Fetch all segments on one event loop, passing each to ``write`` in
+    manifest order as soon as it and its predecessors have arrived."""
+    import aiohttp
+
+    # trust_env so HTTP(S)_PROXY applies here as it does for requests
+    async with aiohttp.ClientSession(
+        headers={"Origin": "https://www.udio.com", "User-Agent": UA},
+        connector=aiohttp.TCPConnector(limit=32),
+        trust_env=True,
+    ) as session:
+        with tqdm(total=len(urls), desc="Downloading segments") as pbar:
+
+            async def fetch(url: str) -> bytes:
+                data = await _afetch(session, url)
+                pbar.update(1)
+                return data
+
+            # Plain tasks rather than a TaskGroup, so a failed segment or a
+            # closed pipe surfaces as the original exception, not an
+            # ExceptionGroup, on every Python version.
+            tasks = [asyncio.ensure_future(fetch(u)) for u in urls]
+            try:
+                for t in tasks:
+                    write(await t)
+            finally:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def download_drm_stream(
+    song_id: str,
+    key_hex: str,
+    dest: Path,
+    segs: dict | None = None,
+    init_data: bytes | None = None,
+    ffmpeg_hls: bool = False,
+) -> None:
+    key_hex = key_hex.strip().lower()
+    try:
+        key_bytes = bytes.fromhex(key_hex)
+    except ValueError:
+        raise ValueError("Decryption key must be exactly 32 hex characters") from None
+    if len(key_bytes) != 16:
+        raise ValueError("Decryption key must be exactly 32 hex characters")
+    key_hex = key_bytes.hex()
+
+    if segs is None:
+        print("Fetching HLS manifest...", file=sys.stderr)
+        segs = fetch_stream_segments(song_id)
+    print(f"  Key ID:   {segs['key_id']}", file=sys.stderr)
+    print(f"  Segments: {len(segs['segment_uris'])} + init", file=sys.stderr)
+
+    if ffmpeg_hls and _ffmpeg_hls_can_decrypt():
+        print("Downloading and decrypting with ffmpeg...", file=sys.stderr)
+        if _decrypt_hls_with_ffmpeg(segs, key_hex, dest):
+            return
+
+    # Init segment
+    if init_data is None:
+        init_data = _fetch_segment(resolve_stream_uri(segs["init_uri"]))
+
+    # Pipe encrypted segments straight into ffmpeg so decryption overlaps
+    # with the downloads instead of waiting for a full temp file.
+    print("Decrypting with ffmpeg...", file=sys.stderr)
+    proc = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-y",
+            "-loglevel", "error",
+            "-decryption_key", key_hex,
+            "-i", "pipe:0",
+            "-c", "copy",
+            str(dest),
+        ],
+        stdin=subprocess.PIPE,
+        bufsize=PIPE_BUFFER_SIZE,
+    )
+    try:
+        proc.stdin.write(init_data)
+
+        # Media segments, fetched concurrently and written in manifest order.
+        # Prefer aiohttp when installed, otherwise fall back to a thread pool.
+        urls = [resolve_stream_uri(s) for s in segs["segment_uris"]]
+        if importlib.util.find_spec("aiohttp") is None:
+            executor = ThreadPoolExecutor(
+                max_workers=min(SEGMENT_WORKERS, len(urls))
+            )
+            try:
+                for data in tqdm(
+                    executor.map(_fetch_segment, urls),
+                    total=len(urls),
+                    desc="Downloading segments",
+                ):
+                    proc.stdin.write(data)
+            except BaseException:
+                # Don't keep downloading queued segments after a failure
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+        else:
+            asyncio.run(_download_segments_async(urls, proc.stdin.write))
+
+        proc.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg exited early; its own error output explains why
+        pass
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        dest.unlink(missing_ok=True)
+        raise
+
+    returncode = proc.wait()
+    if returncode != 0:
+        dest.unlink(missing_ok=True)
+        raise RuntimeError(f"ffmpeg decryption failed (exit code {returncode})")
 
 
 # ---------------------------------------------------------------------------
@@ -352,13 +741,21 @@ def main():
         "--cdm",
         metavar="FILE",
         help="Widevine device file (.wvd). Auto-detected from "
-        "~/.config/music-dl/ or $MUSIC_DL_CDM if not specified.",
+        "~/.config/music-dl/ or $MUSIC_DL_CDM if not specified. "
+        "Acquired content keys are cached in ~/.config/music-dl/keys.json.",
     )
     parser.add_argument(
         "-k",
         "--key",
         help="Decryption key (32-char hex). Skips automatic key acquisition.",
     )
+    parser.add_argument(
+        "--ffmpeg-hls",
+        action="store_true",
+        help="Experimental: let ffmpeg fetch and decrypt the DRM stream "
+        "directly (needs ffmpeg with HLS seg_format_options and ffprobe). "
+        "Falls back to the built-in downloader on failure.",
+    )
     args = parser.parse_args()
 
     output_dir = Path(args.output)
@@ -401,6 +798,7 @@ def main():
         sys.exit(1)
 
     # Determine decryption key
+    segs = init_data = None
     if args.key:
         key_hex = args.key
     else:
@@ -419,7 +817,21 @@ def main():
                 sys.exit(1)
             print(f"Using CDM: {cdm_path}", file=sys.stderr)
             print("Acquiring content key...", file=sys.stderr)
-            key_hex = obtain_content_key(cdm_path, pssh, segs["key_id"])
+            if args.ffmpeg_hls and _ffmpeg_hls_can_decrypt():
+                # ffmpeg will fetch the init segment itself
+                key_hex = obtain_content_key(cdm_path, pssh, segs["key_id"])
+            else:
+                # The license request and init segment both go to
+                # stream.udio.com; overlap them on the shared keep-alive pool.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    license_future = executor.submit(
+                        obtain_content_key, cdm_path, pssh, segs["key_id"]
+                    )
+                    init_future = executor.submit(
+                        _fetch_segment, resolve_stream_uri(segs["init_uri"])
+                    )
+                    key_hex = license_future.result()
+                    init_data = init_future.result()
         else:
             print(f"  Key ID:       {segs['key_id']}", file=sys.stderr)
             if segs.get("pssh_b64"):
@@ -442,7 +854,9 @@ def main():
     m4a_name = safe_filename(info["artist"], info["title"], "m4a")
     m4a_dest = output_dir / m4a_name
     print(f"Downloading DRM stream: {m4a_name}", file=sys.stderr)
-    download_drm_stream(song_id, key_hex, m4a_dest)
+    download_drm_stream(
+        song_id, key_hex, m4a_dest, segs, init_data, ffmpeg_hls=args.ffmpeg_hls
+    )
 
     print(f"Saved to: {m4a_dest}", file=sys.stderr)
 